@@ -1,4 +1,5 @@
 import numpy as np
+from collections import defaultdict
 
 # Simulation parameters
 road_length_m = 30
@@ -69,31 +70,23 @@ def simulate_discrete(seed):
     
     return percent_time_each_length, percent_hours_max_queue
 
-# Run simulations
-results_time_list = []
-results_hour_list = []
+# Run simulations, adding each seed's percentages to running totals as it finishes
+time_totals = defaultdict(float)
+hour_totals = defaultdict(float)
 
 for seed in range(n_seeds):
     t_dict, h_dict = simulate_discrete(seed)
-    results_time_list.append(t_dict)
-    results_hour_list.append(h_dict)
+    for length, pct in t_dict.items():
+        time_totals[length] += pct
+    for q, pct in h_dict.items():
+        hour_totals[q] += pct
 
-# Aggregate results
-all_lengths = set()
-for r in results_time_list:
-    all_lengths.update(r.keys())
-all_lengths = sorted(all_lengths)
-percent_time_avg = {}
-for length in all_lengths:
-    percent_time_avg[length] = round(np.mean([r.get(length, 0) for r in results_time_list]), 2)
+# Average over seeds; a length a seed never reached counts as 0% for it
+all_lengths = sorted(time_totals)
+percent_time_avg = {length: round(time_totals[length] / n_seeds, 2) for length in all_lengths}
 
-all_hour_max = set()
-for r in results_hour_list:
-    all_hour_max.update(r.keys())
-all_hour_max = sorted(all_hour_max)
-percent_hours_avg = {}
-for q in all_hour_max:
-    percent_hours_avg[q] = round(np.mean([r.get(q, 0) for r in results_hour_list]), 2)
+all_hour_max = sorted(hour_totals)
+percent_hours_avg = {q: round(hour_totals[q] / n_seeds, 2) for q in all_hour_max}
 
 # Print results
 print("Percentage of time with each queue length:")
@@ -1,4 +1,6 @@
 import numpy as np
+from collections import defaultdict
+from numba import njit
 
 # Simulation parameters
 road_length_m = 30           # road section length in meters
@@ -12,89 +14,78 @@ road_speed_m_s = road_speed_kmh * 1000 / 3600  # km/h to m/s
 service_time_s = road_length_m / road_speed_m_s
 arrival_rate_per_s = arrival_rate_per_hr / 3600
 
+@njit(cache=True)
+def lindley(a, S):
+    # Departure times of a FIFO single server: d[i] = max(a[i], d[i-1]) + S
+    d = np.empty_like(a)
+    prev = 0.0
+    for i in range(a.size):
+        prev = (a[i] if a[i] > prev else prev) + S
+        d[i] = prev
+    return d
+
 def simulate(seed):
     np.random.seed(seed)
-    t = 0.0
-    queue = []
-    next_arrival = np.random.exponential(1 / arrival_rate_per_s)
-    next_departure = np.inf
-
-    # Time-weighted queue length and per-hour max queue
-    queue_lengths_time = {}
-    max_queue_per_hour = [0] * sim_hours
-
-    while t < sim_hours * 3600:
-        # Determine next event
-        if next_arrival <= next_departure:
-            t_next = next_arrival
-            event_type = "arrival"
-        else:
-            t_next = next_departure
-            event_type = "departure"
-
-        # Current queue length (vehicles on road + waiting)
-        current_queue_length = len(queue) + (1 if next_departure != np.inf and t < next_departure else 0)
-        duration = t_next - t
-        if duration > 0:
-            queue_lengths_time[current_queue_length] = queue_lengths_time.get(current_queue_length, 0) + duration
-
-        # Update max queue per hour
-        current_hour = int(t // 3600)
-        if current_hour < sim_hours:
-            max_queue_per_hour[current_hour] = max(max_queue_per_hour[current_hour], current_queue_length)
-
-        t = t_next
-
-        # Process event
-        if event_type == "arrival":
-            if len(queue) == 0 and next_departure == np.inf:
-                next_departure = t + service_time_s
-            else:
-                queue.append(t)
-            next_arrival = t + np.random.exponential(1 / arrival_rate_per_s)
-        else:  # departure
-            if len(queue) > 0:
-                queue.pop(0)
-                next_departure = t + service_time_s
-            else:
-                next_departure = np.inf
+    horizon = sim_hours * 3600
+
+    # Draw the interarrival gaps in batches until they cover the horizon
+    batch = int(horizon * arrival_rate_per_s * 1.2) + 100
+    arrivals = np.cumsum(np.random.exponential(1 / arrival_rate_per_s, batch))
+    while arrivals[-1] < horizon:
+        more = arrivals[-1] + np.cumsum(np.random.exponential(1 / arrival_rate_per_s, batch))
+        arrivals = np.concatenate((arrivals, more))
+    arrivals = arrivals[arrivals < horizon]
+    departures = lindley(arrivals, service_time_s)
+
+    # Queue length (vehicles on road + waiting) as a step function over time.
+    # The stable sort keeps an arrival ahead of a departure at the same instant.
+    times = np.concatenate((arrivals, departures))
+    steps = np.concatenate((np.ones(arrivals.size, np.int64), -np.ones(departures.size, np.int64)))
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+    lengths = np.cumsum(steps[order])
+    inside = times < horizon
+    times = times[inside]
+    lengths = lengths[inside]
+
+    # Time-weighted queue length
+    durations = np.diff(np.concatenate(([0.0], times, [horizon])))
+    queue_lengths_time = np.bincount(np.concatenate(([0], lengths)), weights=durations)
+
+    # Max queue per hour, including the length carried in at the top of the hour
+    max_queue_per_hour = np.zeros(sim_hours, np.int64)
+    np.maximum.at(max_queue_per_hour, (times // 3600).astype(np.int64), lengths)
+    last_event = np.searchsorted(times, np.arange(sim_hours) * 3600.0, side="right") - 1
+    carried = np.where(last_event >= 0, lengths[np.maximum(last_event, 0)], 0)
+    max_queue_per_hour = np.maximum(max_queue_per_hour, carried)
 
     # Convert time spent to percentage
-    total_time = sum(queue_lengths_time.values())
-    percent_time_each_length = {k: round(v / total_time * 100, 2) for k, v in queue_lengths_time.items()}
+    total_time = queue_lengths_time.sum()
+    percent_time_each_length = {k: round(v / total_time * 100, 2) for k, v in enumerate(queue_lengths_time) if v > 0}
 
     # Convert max queue per hour to percentage of hours
-    unique_max_queues = set(max_queue_per_hour)
-    percent_hours_max_queue = {q: round(max_queue_per_hour.count(q) / sim_hours * 100, 2) for q in unique_max_queues}
+    hour_counts = np.bincount(max_queue_per_hour)
+    percent_hours_max_queue = {q: round(c / sim_hours * 100, 2) for q, c in enumerate(hour_counts) if c > 0}
 
     return percent_time_each_length, percent_hours_max_queue
 
-# Run simulations and average results
-results_time_list = []
-results_hour_list = []
+# Run simulations, adding each seed's percentages to running totals as it finishes
+time_totals = defaultdict(float)
+hour_totals = defaultdict(float)
 
 for seed in range(n_seeds):
     t_dict, h_dict = simulate(seed)
-    results_time_list.append(t_dict)
-    results_hour_list.append(h_dict)
-
-# Aggregate results for time percentages
-all_lengths = set()
-for r in results_time_list:
-    all_lengths.update(r.keys())
-all_lengths = sorted(all_lengths)
-percent_time_avg = {}
-for length in all_lengths:
-    percent_time_avg[length] = round(np.mean([r.get(length, 0) for r in results_time_list]), 2)
-
-# Aggregate results for max queue per hour
-all_hour_max = set()
-for r in results_hour_list:
-    all_hour_max.update(r.keys())
-all_hour_max = sorted(all_hour_max)
-percent_hours_avg = {}
-for q in all_hour_max:
-    percent_hours_avg[q] = round(np.mean([r.get(q, 0) for r in results_hour_list]), 2)
+    for length, pct in t_dict.items():
+        time_totals[length] += pct
+    for q, pct in h_dict.items():
+        hour_totals[q] += pct
+
+# Average over seeds; a length a seed never reached counts as 0% for it
+all_lengths = sorted(time_totals)
+percent_time_avg = {length: round(time_totals[length] / n_seeds, 2) for length in all_lengths}
+
+all_hour_max = sorted(hour_totals)
+percent_hours_avg = {q: round(hour_totals[q] / n_seeds, 2) for q in all_hour_max}
 
 # Print results
 print("Percentage of time with each queue length:")
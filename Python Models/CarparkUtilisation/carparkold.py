@@ -1,84 +1,143 @@
-import random
-import itertools
+import math
 import time
 from collections import Counter
 
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # without Numba (e.g. under PyPy) the kernels run as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
 arrivalrate = 30       # cars per hour
 servicetime = 5.4      # seconds (can be float)
 spaces = 1             # number of spaces
 precision = 0.1        # time step in seconds (can be float)
-
-
-def percentage(percent, values):
-    """Return index where cumulative percentage exceeds given percent."""
-    for index, number in enumerate(values):
-        if number >= percent:
-            return index
-    return len(values) - 1
-
-
-def modelrun(arrivalrate, servicetime, spaces):
-    start_time = time.time()
+percentiles = np.array([10,20,30,40,50,60,70,80,90,95,98,99], dtype=np.float64)
+
+
+@njit(cache=True)
+def first_step_of_hour(hour, precision):
+    """Return the first step whose time step * precision falls in the given hour or later."""
+    step = math.ceil(hour * 3600 / precision)
+    # nudge for float noise, so this agrees exactly with step * precision // 3600
+    while step > 0 and (step - 1) * precision // 3600 >= hour:
+        step -= 1
+    while step * precision // 3600 < hour:
+        step += 1
+    return step
+
+
+@njit(cache=True)
+def simulate_steps(rng, first_step, n_steps, precision, prob_arrival, service_steps, spaces,
+                   carsparked_q, head, parked_len, queue,
+                   count_carsparked_q, count_carsqueued,
+                   max_queue_per_hour, n_hours, current_hour, current_hour_max):
+    """Run up to n_steps steps, drawing arrivals from rng as it goes; carsparked_q is a ring of departure steps, starting at head.
+
+    Stops early if the queue outgrows count_carsqueued, so the caller can grow it and carry on.
+    """
+    cap = carsparked_q.size
     count_arrivals = 0
-    cyclecount = 1000  # number of simulated hours (can adjust)
-
-    maxlen = int(arrivalrate * servicetime / 600 + 200)
-    count_carsparked_q = [0.0] * maxlen
-    count_carsqueued = [0.0] * maxlen
-
-    carsparked_q = []   # list of service times left for parked cars
-    queue = 0
     carsqueued = 0
     queuetime = 0.0
+    # the hour boundary as a step number, so most steps only compare integers
+    next_hour_step = first_step_of_hour(current_hour + 1, precision)
 
-    percentiles = [10,20,30,40,50,60,70,80,90,95,98,99]
-
-    total_steps = int(cyclecount * 3600 / precision)
-
-    # for tracking max queue length per hour
-    max_queue_per_hour = []
-    current_hour_max = 0
-    current_hour = 0
+    for n in range(n_steps):
+        step = first_step + n
 
-    # simulate
-    for step in range(1, total_steps + 1):
-        t = step * precision  # current simulation time (seconds)
+        if queue >= count_carsqueued.size:
+            n_steps = n
+            break
 
         # Count current carpark utilisation
-        count_carsparked_q[max(len(carsparked_q)-1,0)] += 1
-        count_carsqueued[min(queue, len(count_carsqueued)-1)] += 1
+        count_carsparked_q[parked_len] += 1
+        count_carsqueued[queue] += 1
         queuetime += queue * precision
 
         # track max queue for this hour
         if queue > current_hour_max:
             current_hour_max = queue
 
-        # Update parked cars
-        if carsparked_q:
-            carsparked_q = [max(0, item - precision) for item in carsparked_q]
-
-            # remove finished cars (first in)
-            while carsparked_q and carsparked_q[0] <= 0:
-                carsparked_q.pop(0)
-                if queue > 0:
-                    carsparked_q.append(servicetime)
-                    queue -= 1
+        # remove finished cars (first in); departures are in arrival order
+        while parked_len and carsparked_q[head] <= step:
+            head = (head + 1) % cap
+            parked_len -= 1
+            if queue > 0:
+                carsparked_q[(head + parked_len) % cap] = step + service_steps
+                parked_len += 1
+                queue -= 1
 
         # Car arrival process
-        prob_arrival = arrivalrate / 3600 * precision
-        if random.random() < prob_arrival:  # arrival this step
+        if rng.random() < prob_arrival:  # arrival this step
             count_arrivals += 1
-            if len(carsparked_q) < spaces:
-                carsparked_q.append(servicetime)
+            if parked_len < spaces:
+                carsparked_q[(head + parked_len) % cap] = step + service_steps
+                parked_len += 1
             else:
                 queue += 1
                 carsqueued += 1
 
         # check if an hour passed
-        if int(t // 3600) > current_hour:
-            max_queue_per_hour.append(current_hour_max)
+        if step >= next_hour_step:
+            t = step * precision  # current simulation time (seconds)
+            max_queue_per_hour[n_hours] = current_hour_max
+            n_hours += 1
             current_hour = int(t // 3600)
             current_hour_max = queue  # reset for next hour (start with current queue)
+            next_hour_step = first_step_of_hour(current_hour + 1, precision)
+
+    return (head, parked_len, queue, n_hours, current_hour, current_hour_max,
+            count_arrivals, carsqueued, queuetime, n_steps)
+
+
+def modelrun(arrivalrate, servicetime, spaces, seed=None):
+    rng = np.random.default_rng(seed)
+    start_time = time.time()
+    cyclecount = 1000  # number of simulated hours (can adjust)
+
+    count_carsparked_q = np.zeros(spaces + 1, dtype=np.int64)
+    count_carsqueued = np.zeros(64, dtype=np.int64)  # doubled whenever the queue gets longer
+
+    carsparked_q = np.zeros(max(spaces, 1), dtype=np.int64)  # ring of departure steps of parked cars
+    head = 0
+    parked_len = 0
+    queue = 0
+
+    total_steps = int(cyclecount * 3600 / precision)
+    # steps each car stays, rounded up; rounding first stops float noise such as 2.1/0.3 = 7.000000000000001 adding a step
+    service_steps = max(1, math.ceil(round(servicetime / precision, 9)))
+    prob_arrival = arrivalrate / 3600 * precision
+
+    # for tracking max queue length per hour
+    max_queue_per_hour = np.zeros(cyclecount + 2, dtype=np.int64)
+    n_hours = 0
+    current_hour_max = 0
+    current_hour = 0
+
+    # simulate, with one Bernoulli trial per step drawn inside the kernel
+    # it only hands back early when the queue counts need to grow
+    count_arrivals = 0
+    carsqueued = 0
+    queuetime = 0.0
+    step = 1
+    while step <= total_steps:
+        if queue >= count_carsqueued.size:
+            count_carsqueued = np.concatenate((count_carsqueued, np.zeros_like(count_carsqueued)))
+        (head, parked_len, queue, n_hours, current_hour, current_hour_max,
+         arrived, queued, waited, done) = simulate_steps(
+            rng, step, total_steps + 1 - step, precision, prob_arrival, service_steps, spaces,
+            carsparked_q, head, parked_len, queue,
+            count_carsparked_q, count_carsqueued,
+            max_queue_per_hour, n_hours, current_hour, current_hour_max)
+        count_arrivals += arrived
+        carsqueued += queued
+        queuetime += waited
+        step += done
+    max_queue_per_hour = max_queue_per_hour[:n_hours].tolist()
 
     # also append last hour
     if current_hour_max > 0 or len(max_queue_per_hour) < cyclecount:
@@ -91,6 +150,14 @@ def modelrun(arrivalrate, servicetime, spaces):
 
     queue_distribution = {q: round(100*counts.get(q,0)/total_hours,2) for q in range(max_observed_queue+1)}
 
+    # cumulative percentage of time at each length, then the first length reaching each percentile
+    np.cumsum(count_carsqueued, out=count_carsqueued)
+    np.cumsum(count_carsparked_q, out=count_carsparked_q)
+    count_carsqueued = count_carsqueued * (100.0 / total_steps)
+    count_carsparked_q = count_carsparked_q * (100.0 / total_steps)
+    q_idx = np.minimum(np.searchsorted(count_carsqueued, percentiles), len(count_carsqueued) - 1)
+    p_idx = np.minimum(np.searchsorted(count_carsparked_q, percentiles), len(count_carsparked_q) - 1)
+
     # report
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -103,6 +170,14 @@ def modelrun(arrivalrate, servicetime, spaces):
     if carsqueued > 0:
         print("Average Queue time per Queued Vehicle =", round(queuetime / carsqueued,2), "seconds")
 
+    print("\nSpaces occupied at each percentage of time:")
+    for value, parked in zip(percentiles, p_idx):
+        print(f"{value:g}th - {parked} parked")
+
+    print("\nQueue length at each percentage of time:")
+    for value, queued in zip(percentiles, q_idx):
+        print(f"{value:g}th - {queued} queued")
+
     print("\nPercentage of hours with each maximum queue length:")
     for q, pct in queue_distribution.items():
         print(f"Queue {q}: {pct}% of hours")
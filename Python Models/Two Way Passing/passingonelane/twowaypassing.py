@@ -1,5 +1,6 @@
 import heapq
-import random
+import math
+import numpy as np
 from collections import defaultdict
 
 # --- Parameters ---
@@ -69,6 +70,24 @@ def record_time(current_time, queues, server, last_time):
         server.busy_time += dt
     return current_time
 
+def generate_arrivals(rate, rng):
+    # Shifted exponential headways: every arrival is min_gap plus an
+    # exponential gap, drawn in one batch that runs past simulation_time
+    expected = simulation_time / (min_gap + 1 / rate)
+    n = int(expected + 10 * math.sqrt(expected)) + 10
+    while True:
+        arrivals = min_gap * np.arange(1, n + 1) + np.cumsum(rng.exponential(1 / rate, n))
+        if arrivals[-1] > simulation_time:
+            return arrivals
+        n *= 2
+
+def add_histogram(totals, row, hist):
+    # Widen the (queue, length) accumulator when a longer queue turns up
+    if len(hist) > totals.shape[1]:
+        totals = np.pad(totals, ((0, 0), (0, len(hist) - totals.shape[1])))
+    totals[row, :len(hist)] += hist
+    return totals
+
 def select_next_queue(queues):
     # pick queue with earliest arrival globally
     earliest_time = float('inf')
@@ -88,16 +107,17 @@ queues = [Queue("Queue A", num_hours), Queue("Queue B", num_hours)]
 server = Server()
 
 # --- Accumulators ---
-avg_time_weighted = [defaultdict(float), defaultdict(float)]
+# Rows are Queue A / Queue B, columns are queue lengths (widened as needed)
+avg_time_weighted = np.zeros((2, 1))
 avg_server_util = 0
-avg_arrivals_same = [0, 0]
-avg_arrivals_opposite = [0, 0]
-hourly_max_counts_total = [defaultdict(int), defaultdict(int)]
+avg_arrivals_same = np.zeros(2)
+avg_arrivals_opposite = np.zeros(2)
+hourly_max_counts_total = np.zeros((2, 1), np.int64)
 avg_departures = 0
 
 # --- Simulation loop over seeds ---
 for seed in seeds:
-    random.seed(seed)
+    rng = np.random.default_rng(seed)
     last_event_time = 0
     server.reset()
     for q in queues:
@@ -105,14 +125,27 @@ for seed in seeds:
     events = []
     departures_count = 0
 
-    for i, rate in enumerate(arrival_rates):
-        first_arrival = min_gap + random.expovariate(rate)
-        heapq.heappush(events, Event(first_arrival, 'arrival', i))
+    arrivals = [generate_arrivals(rate, rng) for rate in arrival_rates]
+    next_arrival_idx = [1] * len(arrivals)
+
+    for i, queue_arrivals in enumerate(arrivals):
+        heapq.heappush(events, Event(queue_arrivals[0], 'arrival', i))
 
     while events:
-        event = heapq.heappop(events)
+        event = events[0]
         if event.time > simulation_time:
             break
+
+        if event.type == 'arrival':
+            # Walk to the next pre-generated arrival, replacing this arrival
+            # on the heap in a single sift
+            k = next_arrival_idx[event.queue_idx]
+            next_arrival_idx[event.queue_idx] = k + 1
+            next_arrival = arrivals[event.queue_idx][k]
+            heapq.heapreplace(events, Event(next_arrival, 'arrival', event.queue_idx))
+        else:
+            heapq.heappop(events)
+
         last_event_time = record_time(event.time, queues, server, last_event_time)
         q = queues[event.queue_idx]
 
@@ -126,11 +159,6 @@ for seed in seeds:
                 else:
                     q.arrivals_opposite += 1
 
-            # Schedule next arrival with min_gap and adjusted rate
-            dt = random.expovariate(arrival_rates[event.queue_idx])
-            next_arrival = event.time + min_gap + dt
-            heapq.heappush(events, Event(next_arrival, 'arrival', event.queue_idx))
-
             # Start service if server idle
             if not server.busy:
                 next_idx = select_next_queue(queues)
@@ -155,28 +183,26 @@ for seed in seeds:
 
     # --- Accumulate metrics ---
     for i, q in enumerate(queues):
-        for length, t in q.time_weighted_lengths.items():
-            avg_time_weighted[i][length] += t
+        lengths = list(q.time_weighted_lengths.keys())
+        times = list(q.time_weighted_lengths.values())
+        avg_time_weighted = add_histogram(avg_time_weighted, i, np.bincount(lengths, weights=times))
+        hourly_max_counts_total = add_histogram(hourly_max_counts_total, i, np.bincount(q.hourly_max))
         avg_arrivals_same[i] += q.arrivals_same
         avg_arrivals_opposite[i] += q.arrivals_opposite
-        for hour_max in q.hourly_max:
-            hourly_max_counts_total[i][hour_max] += 1
     avg_server_util += server.busy_time
     avg_departures += departures_count
 
 # --- Average metrics ---
-for i in range(2):
-    for length in avg_time_weighted[i]:
-        avg_time_weighted[i][length] /= num_seeds
-    avg_arrivals_same[i] /= num_seeds
-    avg_arrivals_opposite[i] /= num_seeds
+avg_time_weighted /= num_seeds
+avg_arrivals_same /= num_seeds
+avg_arrivals_opposite /= num_seeds
 avg_server_util /= num_seeds
 
 # --- Reporting ---
 for i, q_name in enumerate(["Queue A", "Queue B"]):
-    total_time = sum(avg_time_weighted[i].values())
+    total_time = avg_time_weighted[i].sum()
     print(f"\n{q_name} average time-weighted queue length percentages:")
-    for length in sorted(avg_time_weighted[i].keys()):
+    for length in np.flatnonzero(avg_time_weighted[i]):
         pct = (avg_time_weighted[i][length] / total_time) * 100
         print(f"  Length {length}: {pct:.2f}%")
 
@@ -186,7 +212,7 @@ print(f"\nAverage server utilization: {utilization:.2f}%")
 for i, q_name in enumerate(["Queue A", "Queue B"]):
     total_hours = num_hours * num_seeds
     print(f"\n{q_name} average max queue length per hour percentages:")
-    for length in sorted(hourly_max_counts_total[i].keys()):
+    for length in np.flatnonzero(hourly_max_counts_total[i]):
         pct = (hourly_max_counts_total[i][length] / total_hours) * 100
         print(f"  Max length {length}: {pct:.2f}%")
 
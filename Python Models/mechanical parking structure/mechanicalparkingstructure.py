@@ -1,7 +1,10 @@
+import math
 import random
 import heapq
 from collections import defaultdict
 
+import numpy as np
+
 # --- Configurable Parameters ---
 SIMULATION_HOURS = 1000
 ENTRY_RATE = 15      # cars/hour arriving to be parked
@@ -12,6 +15,12 @@ NUM_SEEDS = 100
 PRIORITY = "FCFS"  # options: "FCFS", "CARS", "PEOPLE"
 
 
+def wait_buffer(rate):
+    # Room for the expected number of arrivals plus a wide (10 sigma) margin
+    expected = rate * SIMULATION_HOURS
+    return np.empty(int(expected + 10 * math.sqrt(expected)) + 10)
+
+
 def run_simulation(seed):
     random.seed(seed)
     SIM_TIME = SIMULATION_HOURS * 3600
@@ -34,38 +43,40 @@ def run_simulation(seed):
     queue_length_time_exit = defaultdict(float)
     max_queue_entry = defaultdict(int)  # hours with max queue length
     max_queue_exit = defaultdict(int)
+    hour, next_hour = -1, 0.0
+    hour_max_entry, hour_max_exit = 0, 0
 
-    delayed_entry, total_entry = 0, 0
-    delayed_exit, total_exit = 0, 0
+    total_entry, total_exit = 0, 0
 
-    entry_wait_times, exit_wait_times = [], []
+    entry_wait_times, exit_wait_times = wait_buffer(ENTRY_RATE), wait_buffer(EXIT_RATE)
+    n_entry_waits, n_exit_waits = 0, 0
 
     while FEL:
-        time, event = heapq.heappop(FEL)
+        time, event = FEL[0]
         if time > SIM_TIME:
             break
 
+        # Arrivals reschedule themselves, so pop and push in a single sift
+        if event == "arrival_entry":
+            heapq.heapreplace(FEL, (time + random.expovariate(ENTRY_RATE/3600), "arrival_entry"))
+        elif event == "arrival_exit":
+            heapq.heapreplace(FEL, (time + random.expovariate(EXIT_RATE/3600), "arrival_exit"))
+        else:
+            heapq.heappop(FEL)
+
         # Record queue length time
         dt = time - last_time
-        if entry_queue:
-            queue_length_time_entry[len(entry_queue)] += dt
-        else:
-            queue_length_time_entry[0] += dt
-        if exit_queue:
-            queue_length_time_exit[len(exit_queue)] += dt
-        else:
-            queue_length_time_exit[0] += dt
+        queue_length_time_entry[len(entry_queue)] += dt
+        queue_length_time_exit[len(exit_queue)] += dt
         last_time = time
 
         if event == "arrival_entry":
             total_entry += 1
             entry_queue.append(time)
-            heapq.heappush(FEL, (time + random.expovariate(ENTRY_RATE/3600), "arrival_entry"))
 
         elif event == "arrival_exit":
             total_exit += 1
             exit_queue.append(time)
-            heapq.heappush(FEL, (time + random.expovariate(EXIT_RATE/3600), "arrival_exit"))
 
         elif event == "departure":
             server_busy_until = time
@@ -99,22 +110,40 @@ def run_simulation(seed):
                 kind, arrival_time = chosen
                 wait = time - arrival_time
                 if kind == "entry":
-                    if wait > 0: delayed_entry += 1
-                    entry_wait_times.append(wait)
+                    if n_entry_waits == len(entry_wait_times):
+                        entry_wait_times = np.concatenate((entry_wait_times, np.empty_like(entry_wait_times)))
+                    entry_wait_times[n_entry_waits] = wait
+                    n_entry_waits += 1
                     service_time = ENTRY_SERVICE_TIME
                 else:
-                    if wait > 0: delayed_exit += 1
-                    exit_wait_times.append(wait)
+                    if n_exit_waits == len(exit_wait_times):
+                        exit_wait_times = np.concatenate((exit_wait_times, np.empty_like(exit_wait_times)))
+                    exit_wait_times[n_exit_waits] = wait
+                    n_exit_waits += 1
                     service_time = EXIT_SERVICE_TIME
                 finish_time = time + service_time
                 heapq.heappush(FEL, (finish_time, "departure"))
                 busy_time += service_time
                 server_busy_until = finish_time
 
-        # Record max queue per hour
-        hour = int(time // 3600)
-        max_queue_entry[hour] = max(max_queue_entry[hour], len(entry_queue))
-        max_queue_exit[hour] = max(max_queue_exit[hour], len(exit_queue))
+        # Record max queue per hour; events arrive in time order, so keep a
+        # running max and only store it once time crosses the next boundary
+        if time >= next_hour:
+            if hour >= 0:
+                max_queue_entry[hour] = hour_max_entry
+                max_queue_exit[hour] = hour_max_exit
+            hour = int(time // 3600)
+            next_hour = (hour + 1) * 3600.0
+            hour_max_entry, hour_max_exit = len(entry_queue), len(exit_queue)
+        else:
+            if len(entry_queue) > hour_max_entry:
+                hour_max_entry = len(entry_queue)
+            if len(exit_queue) > hour_max_exit:
+                hour_max_exit = len(exit_queue)
+
+    if hour >= 0:
+        max_queue_entry[hour] = hour_max_entry
+        max_queue_exit[hour] = hour_max_exit
 
     # Aggregate stats
     total_time = SIM_TIME
@@ -134,12 +163,16 @@ def run_simulation(seed):
     entry_max_hist = max_histogram_to_pct(max_queue_entry)
     exit_max_hist = max_histogram_to_pct(max_queue_exit)
 
-    avg_wait_entry_arrival = sum(entry_wait_times)/total_entry if total_entry > 0 else 0
-    avg_wait_entry_queued = (sum([w for w in entry_wait_times if w > 0]) / delayed_entry
-                             if delayed_entry > 0 else 0)
-    avg_wait_exit_arrival = sum(exit_wait_times)/total_exit if total_exit > 0 else 0
-    avg_wait_exit_queued = (sum([w for w in exit_wait_times if w > 0]) / delayed_exit
-                            if delayed_exit > 0 else 0)
+    entry_wait_times = entry_wait_times[:n_entry_waits]
+    exit_wait_times = exit_wait_times[:n_exit_waits]
+    entry_delays = entry_wait_times[entry_wait_times > 0]
+    exit_delays = exit_wait_times[exit_wait_times > 0]
+    delayed_entry, delayed_exit = entry_delays.size, exit_delays.size
+
+    avg_wait_entry_arrival = entry_wait_times.sum()/total_entry if total_entry > 0 else 0
+    avg_wait_entry_queued = entry_delays.sum()/delayed_entry if delayed_entry > 0 else 0
+    avg_wait_exit_arrival = exit_wait_times.sum()/total_exit if total_exit > 0 else 0
+    avg_wait_exit_queued = exit_delays.sum()/delayed_exit if delayed_exit > 0 else 0
 
     return {
         "utilisation": utilisation,
@@ -23,8 +23,11 @@ def lift_simulation_queue_correct(arrival_rate_up_per_hour, arrival_rate_down_pe
     # Initialize queues
     queue_up = deque()
     queue_down = deque()
-    wait_times_up = []
-    wait_times_down = []
+    # Each passenger waits once, so the arrival counts bound the wait buffers
+    wait_times_up = np.empty(len(up_arrivals))
+    wait_times_down = np.empty(len(down_arrivals))
+    n_waits_up = 0
+    n_waits_down = 0
 
     # Queue length tracking
     queue_history_up = defaultdict(float)
@@ -64,10 +67,12 @@ def lift_simulation_queue_correct(arrival_rate_up_per_hour, arrival_rate_down_pe
         elif event_type == "lift_free":
             if queue_up:
                 arrival_time = queue_up.popleft()
-                wait_times_up.append(max(0, lift_busy_until - arrival_time))
+                wait_times_up[n_waits_up] = max(0, lift_busy_until - arrival_time)
+                n_waits_up += 1
             elif queue_down:
                 arrival_time = queue_down.popleft()
-                wait_times_down.append(max(0, lift_busy_until - arrival_time))
+                wait_times_down[n_waits_down] = max(0, lift_busy_until - arrival_time)
+                n_waits_down += 1
             else:
                 continue
 
@@ -100,8 +105,8 @@ def lift_simulation_queue_correct(arrival_rate_up_per_hour, arrival_rate_down_pe
     percent_time_moving = lift_moving_time / total_seconds * 100
     avg_arrivals_up = len(up_arrivals) / hours
     avg_arrivals_down = len(down_arrivals) / hours
-    avg_wait_up = np.mean(wait_times_up) if wait_times_up else 0
-    avg_wait_down = np.mean(wait_times_down) if wait_times_down else 0
+    avg_wait_up = wait_times_up[:n_waits_up].mean() if n_waits_up else 0
+    avg_wait_down = wait_times_down[:n_waits_down].mean() if n_waits_down else 0
 
     return {
         "percent_time_in_lift": percent_time_in_lift,
@@ -117,7 +122,11 @@ def lift_simulation_queue_correct(arrival_rate_up_per_hour, arrival_rate_down_pe
 # --- Run 100 seeds × 100 hours ---
 hours = 1000
 num_seeds = 10
-all_stats = []
+
+# Add each seed's statistics to running totals as soon as it finishes,
+# rather than holding every per-seed dict until the end
+totals = defaultdict(float)
+queue_totals = {"up": defaultdict(float), "down": defaultdict(float)}
 
 for seed in range(num_seeds):
     stats = lift_simulation_queue_correct(
@@ -127,19 +136,16 @@ for seed in range(num_seeds):
         hours=hours,
         seed=seed
     )
-    all_stats.append(stats)
-
-# Average numeric statistics
-def average_dict(dict_list):
-    avg_dict = {}
-    keys = dict_list[0].keys()
-    for k in keys:
+    for k, v in stats.items():
         if 'queue_history' in k:
             continue
-        avg_dict[k] = np.mean([d[k] for d in dict_list])
-    return avg_dict
+        totals[k] += v
+    for direction, history in queue_totals.items():
+        for q_len, t in stats[f"queue_history_{direction}"].items():
+            history[q_len] += t
 
-avg_stats = average_dict(all_stats)
+# Average numeric statistics
+avg_stats = {k: v / num_seeds for k, v in totals.items()}
 
 # Print formatted averages
 print(f"Average over {num_seeds} seeds ({hours} hours each):")
@@ -151,20 +157,12 @@ print(f"Average wait time UP: {avg_stats['avg_wait_up']:.1f} secs")
 print(f"Average wait time DOWN: {avg_stats['avg_wait_down']:.1f} secs\n")
 
 # --- Compute average queue length percentages across seeds ---
-def average_queue_history(all_stats, direction):
-    totals = defaultdict(list)
-    key = f"queue_history_{direction}"
-    for stats in all_stats:
-        for q_len, t in stats[key].items():
-            totals[q_len].append(t)
-    avg_percentages = {}
-    total_time = hours * 3600
-    for q_len, times in totals.items():
-        avg_percentages[q_len] = np.mean(times) / total_time * 100
-    return avg_percentages
-
-avg_queue_up = average_queue_history(all_stats, "up")
-avg_queue_down = average_queue_history(all_stats, "down")
+def average_queue_history(history):
+    total_time = hours * 3600 * num_seeds
+    return {q_len: t / total_time * 100 for q_len, t in history.items()}
+
+avg_queue_up = average_queue_history(queue_totals["up"])
+avg_queue_down = average_queue_history(queue_totals["down"])
 
 # Print average queue tables
 def print_avg_queue_table(avg_queue, direction):
@@ -1,19 +1,34 @@
-from flask import Flask, request, jsonify
-from flask import Flask, send_from_directory
+import json
+from functools import lru_cache
+
+from flask import Flask, Response, abort, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-import subprocess
+
+from carpark import simulate as simulate_unlimited, simulate_progress as progress_unlimited, report as report_unlimited
+from carpark_blocking_web import simulate as simulate_blocking, simulate_progress as progress_blocking, report as report_blocking
+from carpark_queueing_web import simulate as simulate_queueing, simulate_progress as progress_queueing, report as report_queueing
 
 app = Flask(__name__)
 CORS(app)
 
-def python_script1():
-    import carpark
+# Seed the web runs so the same inputs always give the same results on this host
+# (the number of replicates follows the CPU count, so another machine can differ)
+SEED = 0
+
+@lru_cache(maxsize=512)
+def cached_simulation(simulate, arrivalrate, servicetime, spaces):
+    # Results are shared between requests, so callers must copy rather than modify them
+    return simulate(arrivalrate, servicetime, spaces, seed=SEED)
 
-def python_script2():
-    import carpark_blocking_web
+# Progress generator and report for each streamed script
+STREAMS = {
+    1: (progress_unlimited, report_unlimited),
+    2: (progress_blocking, report_blocking),
+    3: (progress_queueing, report_queueing),
+}
 
-def python_script3():
-    import carpark_queueing_web
+def sse(event):
+    return f"data: {json.dumps(event)}\n\n"
 
 @app.route('/')
 def index():
@@ -35,18 +50,13 @@ def run_script1():
     input3 = data.get('input3')
 
     try:
-        # Pass these integers as needed to your script
-        result = subprocess.run(
-            ['python3', 'carpark.py', str(input1), str(input2), str(input3)],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        output = result.stdout
-    except subprocess.CalledProcessError as e:
-        output = f"Error: {e.stderr}"
-
-    return jsonify({"output": output})
+        # Run the model in-process and send its numbers alongside the text report
+        result = cached_simulation(simulate_unlimited, int(input1), int(input2), None)
+        output = report_unlimited(result)
+    except Exception as e:
+        return jsonify({"output": f"Error: {e}"})
+
+    return jsonify({"output": output, **result})
 
 @app.route('/run-script2', methods=['POST'])
 def run_script2():
@@ -56,18 +66,13 @@ def run_script2():
     input3 = data.get('input3')
 
     try:
-        # Pass these integers as needed to your script
-        result = subprocess.run(
-            ['python3', 'carpark_blocking_web.py', str(input1), str(input2), str(input3)],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        output = result.stdout
-    except subprocess.CalledProcessError as e:
-        output = f"Error: {e.stderr}"
-
-    return jsonify({"output": output})
+        # Run the model in-process and send its numbers alongside the text report
+        result = cached_simulation(simulate_blocking, int(input1), int(input2), int(input3))
+        output = report_blocking(result)
+    except Exception as e:
+        return jsonify({"output": f"Error: {e}"})
+
+    return jsonify({"output": output, **result})
 
 @app.route('/run-script3', methods=['POST'])
 def run_script3():
@@ -77,18 +82,36 @@ def run_script3():
     input3 = data.get('input3')
 
     try:
-        # Pass these integers as needed to your script
-        result = subprocess.run(
-            ['python3', 'carpark_queueing_web.py', str(input1), str(input2), str(input3)],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        output = result.stdout
-    except subprocess.CalledProcessError as e:
-        output = f"Error: {e.stderr}"
-
-    return jsonify({"output": output})
+        # Run the model in-process and send its numbers alongside the text report
+        result = cached_simulation(simulate_queueing, int(input1), int(input2), int(input3))
+        output = report_queueing(result)
+    except Exception as e:
+        return jsonify({"output": f"Error: {e}"})
+
+    return jsonify({"output": output, **result})
+
+@app.route('/stream-script<int:script>')
+def stream_script(script):
+    # Server-Sent Events: progress after each stability check, then the full result
+    # Closing the EventSource closes the generator, which stops the model at its next check
+    if script not in STREAMS:
+        abort(404)
+    progress, report = STREAMS[script]
+    # Missing or non-integer inputs come back as None, so turn them away before starting a model
+    inputs = [request.args.get(name, type=int) for name in ('input1', 'input2', 'input3')]
+    if None in inputs:
+        abort(400)
+
+    def events():
+        try:
+            for event in progress(*inputs, seed=SEED):
+                if event.get("done"):
+                    event = {"done": True, "output": report(event["result"]), **event["result"]}
+                yield sse(event)
+        except Exception as e:
+            yield sse({"done": True, "output": f"Error: {e}"})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream')
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,66 +1,90 @@
 #Import Functions Required
-import random
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sim_kernels import run_unlimited, burn_in, final_result, replicate_rngs
 
-#Define Functions
-def percentageoftime(percent,list):
-    cumulativesum = 0
-    totaltime = sum(list)
-    targetsum = totaltime * percent / 100
-    for index, value in enumerate(list):
-        cumulativesum += value
-        if cumulativesum >= targetsum:
-            return index
-
-arrivalrate = int(sys.argv[1])
-servicetime = int(sys.argv[2])
-
-#print("Cycles per second for precision?")
-precision = 1 #int(input("Enter number above 0: "))
-
-#Intialise All Variables
-carsparked = []
-arrival = 0
-count_arrivals = 0
-count_carsparked = [0] * int(arrivalrate * servicetime+1) 
-utilisation = []
-test = 0 
-hours = 0
 percentiles = [10,20,30,40,50,60,70,80,90,95,98,99]
-cyclecount = 1000
-
-#Generate Arrivals
-
-start_time = time.time()
-for i in range (1,cyclecount * 3600 * precision):
-    arrival = random.randint(1,3600 * precision)
-    if i >= 3600*cyclecount:
-        break
-
-    # Count current carpark utilisation
-    count_carsparked[max(len(carsparked),0)] += 1
-
-    # Reduce parked cars time remaining by passing time
-    if len(carsparked) > 0:
-        carsparked = [item - 1 for item in carsparked]
-        if carsparked[0] == 0:
-            del carsparked[0]
-
-    # Check if new car arrived and at to carpark
-    if arrival <= arrivalrate * precision:
-        count_arrivals += 1
-        carsparked.append(servicetime)
-
-# Calculate the elapsed time
-end_time = time.time()
-elapsed_time = end_time - start_time
-print("Model completed in ", int(round(elapsed_time,0)), " seconds", sep='')
-
-# Find model outputs
-print("Modelled Arrivals = ", round(count_arrivals / cyclecount / precision,1))
-
-# Find Percentage Thresholds
-print("Spaces Required if Unlimited Parking Avaialble")
-for value in percentiles:
-    print(value,"th percentile - ",percentageoftime(value,count_carsparked), sep='')
+
+#Define Functions
+def percentageoftime(percents,counts):
+    #Index at which the cumulative time first reaches each percentage
+    cumulativesum = np.cumsum(counts)
+    targetsums = cumulativesum[-1] * np.asarray(percents) / 100
+    return np.searchsorted(cumulativesum, targetsums).tolist()
+
+def simulate(arrivalrate, servicetime, spaces=None, seed=None):
+    return final_result(simulate_progress(arrivalrate, servicetime, spaces, seed))
+
+def simulate_progress(arrivalrate, servicetime, spaces=None, seed=None):
+    #Model a carpark with no limit on spaces; spaces is accepted for a common signature and ignored
+    #Yields the arrivals per hour so far after each modelled hour, then the final result
+
+    #print("Cycles per second for precision?")
+    precision = 1 #int(input("Enter number above 0: "))
+
+    #Intialise All Variables
+    rngs = replicate_rngs(seed)
+    workers = len(rngs)
+    # Cars due to leave at each tick, indexed by tick modulo the ring length
+    departures = np.zeros((workers, servicetime + 1), dtype=np.int64)
+    parked = [0] * workers
+    count_arrivals = 0
+    # At most one car arrives a tick and each stays servicetime ticks, so no more than servicetime are ever parked
+    count_carsparked = np.zeros((workers, servicetime + 1), dtype=np.int64)
+    # Hours are shared out evenly, so round the total up to a whole number per replicate
+    cyclecount = -(-1000 // workers) * workers
+
+    def run_replicate(w, block):
+        # Draw the arrivals at once: each tick is a Bernoulli trial
+        arrivals = rngs[w].random(block) < arrivalrate / 3600
+        parked[w], arrived = run_unlimited(arrivals, elapsed[w], departures[w], parked[w], count_carsparked[w])
+        elapsed[w] += block
+        return arrived
+
+    #Generate Arrivals
+
+    start_time = time.time()
+    block = 3600 * precision
+    # Ticks each replicate has modelled so far
+    elapsed = [0] * workers
+    with ThreadPoolExecutor(workers) as pool:
+        # Warm every replicate up from empty, then forget what it counted
+        list(pool.map(run_replicate, range(workers), [burn_in(servicetime)] * workers))
+        count_carsparked[:] = 0
+
+        for block_start in range(0, cyclecount * 3600 * precision // workers, block):
+            # Run an hour of every replicate, then gather their counts
+            count_arrivals += sum(pool.map(run_replicate, range(workers), [block] * workers))
+            hours = (block_start + block) * workers / (3600 * precision)
+            yield {"hours": hours, "arrivals": round(count_arrivals / hours,1)}
+    count_carsparked = count_carsparked.sum(axis=0)
+
+    # Calculate the elapsed time
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+
+    yield {"done": True, "result": {
+        "elapsed_time": elapsed_time,
+        "hours": cyclecount,
+        "arrivals": round(count_arrivals / cyclecount / precision,1),
+        "percentiles": dict(zip(percentiles, percentageoftime(percentiles,count_carsparked))),
+    }}
+
+def report(result):
+    lines = ["Model completed in " + str(int(round(result["elapsed_time"],0))) + " seconds"]
+
+    # Find model outputs
+    lines.append("Modelled Arrivals =  " + str(result["arrivals"]))
+
+    # Find Percentage Thresholds
+    lines.append("Spaces Required if Unlimited Parking Avaialble")
+    for value, spaces in result["percentiles"].items():
+        lines.append(str(value) + "th percentile - " + str(spaces))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    print(report(simulate(int(sys.argv[1]), int(sys.argv[2]))))
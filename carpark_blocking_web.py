@@ -1,84 +1,117 @@
 #Import Functions Required
-import random
-import itertools
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sim_kernels import run_blocking, burn_in, final_result, replicate_rngs, settled, split_interval
 # os.system('clear')
 
-arrivalrate = int(sys.argv[1])
-servicetime = int(sys.argv[2])
-spaces = int(sys.argv[3])
+percentiles = [10,20,30,40,50,60,70,80,90,95,98,99]
 
 #Define Functions
-def percentageoftime(percent,list):
-    cumulativesum = 0
-    totaltime = sum(list)
-    targetsum = totaltime * percent / 100
-    for index, value in enumerate(list):
-        cumulativesum += value
-        if cumulativesum >= targetsum:
-            return index
-
-
-precision = 1 #int(input("Enter number above 0: "))
-cyclecount = 10000
-
-#Intialise All Variables
-carsparked = []
-arrival = 0
-count_arrivals = 0
-count_carsparked = [0] * int(arrivalrate*servicetime+1) 
-utilisation = []
-count_serviced = 0
-count_blocked = 0
-count_carsparked_q = [0] * int(arrivalrate*servicetime+1) 
-carsparked_q = [0]
-carsqueued = [0]
-percentiles = [10,20,30,40,50,60,70,80,90,95,98,99]
-blocktest = 0
-hours = 0
-
-#Generate Arrivals
-start_time = time.time()
-for i in range (1,cyclecount * 3600 * precision):
-    if i % 360000  == 0 and i  > 3600*1000:
-        if blocktest == round(count_blocked/count_arrivals,5):
-            hours = i / 3600
-            break
-        else:
-            blocktest = round(count_blocked/count_arrivals,5)
-
-    # Check if new car arrived and add to carpark
-    arrival = random.randint(1,3600 * precision)
-    if arrival <= arrivalrate * precision:
-        count_arrivals += 1
-        if len(carsparked) < spaces:
-            carsparked.append(servicetime)
-            count_serviced += 1
+def percentageoftime(percents,counts):
+    #Index at which the cumulative time first reaches each percentage
+    cumulativesum = np.cumsum(counts)
+    targetsums = cumulativesum[-1] * np.asarray(percents) / 100
+    return np.searchsorted(cumulativesum, targetsums).tolist()
+
+def simulate(arrivalrate, servicetime, spaces, seed=None):
+    return final_result(simulate_progress(arrivalrate, servicetime, spaces, seed))
+
+def simulate_progress(arrivalrate, servicetime, spaces, seed=None):
+    #Model a carpark where arrivals are turned away once all spaces are taken
+    #Yields the blocked share after each stability check interval, then the final result
+
+    cyclecount = 10000
+
+    #Intialise All Variables
+    rngs = replicate_rngs(seed)
+    workers = len(rngs)
+    # Ring of departure times of the parked cars in arrival order, starting at head
+    finish = np.zeros((workers, max(spaces, 1)))
+    head = [0] * workers
+    parked = [0] * workers
+    count_arrivals = 0
+    # Seconds spent at each number of parked cars
+    count_carsparked = np.zeros((workers, spaces + 1))
+    count_serviced = 0
+    count_blocked = 0
+    # Totals at the last stability check
+    last_blocked = 0
+    last_arrivals = 0
+    hours = 0
+
+    def run_replicate(w, block):
+        # Draw the arrivals up to the next stability check at once: a Poisson number of them, spread uniformly
+        block_start = elapsed[w]
+        arrivals = rngs[w].poisson(arrivalrate / 3600 * block)
+        arrival_times = block_start + np.sort(rngs[w].random(arrivals)) * block
+        head[w], parked[w], blocked = run_blocking(
+            arrival_times, block_start, block_start + block, servicetime, spaces, finish[w], head[w], parked[w], count_carsparked[w])
+        elapsed[w] += block
+        return arrivals, blocked
+
+    #Generate Arrivals
+    start_time = time.time()
+    # The replicates share each stability check interval between them
+    interval = 360000
+    blocks = split_interval(interval, workers)
+    # Seconds each replicate has modelled so far
+    elapsed = [0] * workers
+    with ThreadPoolExecutor(workers) as pool:
+        # Warm every replicate up from empty, then forget what it counted
+        list(pool.map(run_replicate, range(workers), [burn_in(servicetime)] * workers))
+        count_carsparked[:] = 0
+
+        for check in range(cyclecount * 3600 // interval):
+            if check * interval > 3600*1000:
+                if settled(count_blocked, count_arrivals, last_blocked, last_arrivals):
+                    hours = check * interval / 3600
+                    break
+                else:
+                    last_blocked, last_arrivals = count_blocked, count_arrivals
+
+            results = pool.map(run_replicate, range(workers), blocks)
+            for arrived, blocked in results:
+                count_arrivals += arrived
+                count_serviced += arrived - blocked
+                count_blocked += blocked
+            if count_arrivals:
+                yield {"hours": (check + 1) * interval / 3600,
+                       "blocked_pct": round(count_blocked*100/count_arrivals,2)}
         else:
-            count_blocked += 1
-    # Count current carpark utilisation
-    count_carsparked[max(len(carsparked),0)] += 1
-
-    # Reduce parked cars time remaining by passing time
-    if len(carsparked) > 0:
-        carsparked = [item - 1 for item in carsparked]
-        if carsparked[0] == 0:
-            del carsparked[0]
-
-
-# Calculate the elapsed time in reality and model
-cyclecount = hours
-end_time = time.time()
-elapsed_time = end_time - start_time
-print("Model completed in ", int(round(elapsed_time,0)), " seconds", sep='')
-print(hours, "Hours modelled until stable results")
-
-# Find model outputs
-print("Modelled Arrivals = ", round(count_arrivals / cyclecount / precision,1))
-
-# Find Percentage Thresholds
-print("Spaces Required if no queue option (Erlang-Blocking)")
-for value in percentiles:
-    print(value,"th percentile - ",percentageoftime(value,count_carsparked), sep='')
-print("Cars Blocked: ", round(count_blocked*100/(count_blocked+count_serviced),2),"%", sep='')
+            # Never settled, so report on everything that was modelled
+            hours = (check + 1) * interval / 3600
+    count_carsparked = count_carsparked.sum(axis=0)
+
+    # Calculate the elapsed time in reality and model
+    cyclecount = hours
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+
+    yield {"done": True, "result": {
+        "elapsed_time": elapsed_time,
+        "hours": hours,
+        "arrivals": round(count_arrivals / cyclecount,1),
+        "percentiles": dict(zip(percentiles, percentageoftime(percentiles,count_carsparked))),
+        "blocked_pct": round(count_blocked*100/(count_blocked+count_serviced),2),
+    }}
+
+def report(result):
+    lines = ["Model completed in " + str(int(round(result["elapsed_time"],0))) + " seconds"]
+    lines.append(str(result["hours"]) + " Hours modelled until stable results")
+
+    # Find model outputs
+    lines.append("Modelled Arrivals =  " + str(result["arrivals"]))
+
+    # Find Percentage Thresholds
+    lines.append("Spaces Required if no queue option (Erlang-Blocking)")
+    for value, spaces in result["percentiles"].items():
+        lines.append(str(value) + "th percentile - " + str(spaces))
+    lines.append("Cars Blocked: " + str(result["blocked_pct"]) + "%")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    print(report(simulate(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]))))
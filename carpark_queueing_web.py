@@ -1,98 +1,135 @@
 
 #Import Functions Required
-import random
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sim_kernels import run_queueing, burn_in, final_result, replicate_rngs, settled, split_interval
 
-arrivalrate = int(sys.argv[1])
-servicetime = int(sys.argv[2])
-spaces = int(sys.argv[3])
 precision = 1
+percentiles = [10,20,30,40,50,60,70,80,90,95,98,99]
 
 #Define Functions
-def percentageoftime(percent,list):
-    cumulativesum = 0
-    totaltime = sum(list)
-    targetsum = totaltime * percent / 100
-    for index, value in enumerate(list):
-        cumulativesum += value
-        if cumulativesum >= targetsum:
-            return index
+def percentageoftime(percents,counts):
+    #Index at which the cumulative time first reaches each percentage
+    cumulativesum = np.cumsum(counts)
+    targetsums = cumulativesum[-1] * np.asarray(percents) / 100
+    return np.searchsorted(cumulativesum, targetsums).tolist()
+
+def simulate(arrivalrate,servicetime,spaces,seed=None):
+    return final_result(simulate_progress(arrivalrate,servicetime,spaces,seed))
 
-def modelrun(arrivalrate,servicetime,spaces):
+def simulate_progress(arrivalrate,servicetime,spaces,seed=None):
+    #Model a carpark where arrivals queue for the next free space once all spaces are taken
+    #Yields the queued share after each stability check interval, then the final result
 
     #Intialise All Variables
     start_time = time.time()
     count_arrivals = 0
-    count_carsparked = [0] * int(spaces+1)
-    count_carsqueued = [0] * int(arrivalrate * servicetime)
-    carsparked = []
-    cyclecount = int(10000)
-    arrival = 0
+    rngs = replicate_rngs(seed)
+    workers = len(rngs)
+    count_carsparked = np.zeros((workers, spaces + 1), dtype=np.int64)
+    # Ticks at each queue length, one array per replicate, starting short and doubled whenever its queue outgrows it
+    count_carsqueued = [np.zeros(64, dtype=np.int64) for w in range(workers)]
+    # Cars due to leave at each tick, indexed by tick modulo the ring length
+    departures = np.zeros((workers, servicetime + 1), dtype=np.int64)
+    parked = [0] * workers
+    cyclecount = 10000
     carsqueued = 0
-    queue = 0
-    percentiles = [10,20,30,40,50,60,70,80,90,95,98,99]
+    queue = [0] * workers
     queuetime = 0
-    queuetest = 0
+    # Totals at the last stability check
+    last_queued = 0
+    last_arrivals = 0
     hours = 0
-    minimumqueue = 0
+
+    def run_replicate(w, block):
+        # Draw the arrivals up to the next stability check at once: each tick is a Bernoulli trial
+        block_start = elapsed[w]
+        arrivals = rngs[w].random(block) < arrivalrate / 3600
+        arrived = queued = waited = done = 0
+        while True:
+            parked[w], queue[w], batch_arrived, batch_queued, batch_waited, ticks = run_queueing(
+                arrivals[done:], block_start + done, departures[w], parked[w], queue[w], spaces,
+                count_carsparked[w], count_carsqueued[w])
+            arrived += batch_arrived
+            queued += batch_queued
+            waited += batch_waited
+            done += ticks
+            if done == block:
+                elapsed[w] += block
+                return arrived, queued, waited
+            # The queue is about to outgrow this replicate's counts, so double them and carry on
+            count_carsqueued[w] = np.concatenate((count_carsqueued[w], np.zeros_like(count_carsqueued[w])))
 
     #Generate Arrivals
-    
-    for i in range (1,cyclecount * 3600 ):
-        if i  > 3600*500 and i%36000 ==0:
-            if queuetest == round(carsqueued/count_arrivals,5):
-                hours = i / 3600
-                break
-            else:
-                queuetest = round(carsqueued/count_arrivals,5)
-                
-        # Check if new car arrived and at to carpark
-        arrival = random.randint(1,3600 * precision)
-        if arrival <= arrivalrate * precision:
-            count_arrivals += 1
-            if len(carsparked) < spaces:
-                carsparked.append(servicetime)
-            else: 
-                queue +=1
-                carsqueued +=1
-                minimumqueue += carsparked[0]
-
-
-        # Count current carpark utilisation
-        count_carsparked[max(len(carsparked),0)] += 1
-        count_carsqueued[queue] += 1
-        queuetime += queue
-
-        # Reduce parked cars time remaining by passing time
-        if len(carsparked) > 0:
-            carsparked = [item - 1 for item in carsparked]
-
-            # move finished cars out and queued cars in    
-            if carsparked[0] == 0:
-
-                del carsparked[0]
-                if queue > 0:
-                    carsparked.append(servicetime)
-                    queue -= 1
+    # The replicates share each stability check interval between them
+    interval = 36000
+    blocks = split_interval(interval, workers)
+    # Ticks each replicate has modelled so far
+    elapsed = [0] * workers
+    with ThreadPoolExecutor(workers) as pool:
+        # Warm every replicate up from empty, then forget what it counted
+        list(pool.map(run_replicate, range(workers), [burn_in(servicetime)] * workers))
+        count_carsparked[:] = 0
+        for counts in count_carsqueued:
+            counts[:] = 0
 
-    cyclecount = hours
+        for check in range(cyclecount * 3600 // interval):
+            if check * interval > 3600*500:
+                if settled(carsqueued, count_arrivals, last_queued, last_arrivals):
+                    hours = check * interval / 3600
+                    break
+                else:
+                    last_queued, last_arrivals = carsqueued, count_arrivals
 
-    for index, value in enumerate(count_carsparked):
-        count_carsparked[index] = count_carsparked[index] / (hours * 3600)
+            results = pool.map(run_replicate, range(workers), blocks)
+            for arrived, queued, waited in results:
+                count_arrivals += arrived
+                carsqueued += queued
+                queuetime += waited
+            if count_arrivals:
+                yield {"hours": (check + 1) * interval / 3600,
+                       "queued_pct": round(carsqueued * 100 / count_arrivals,2)}
+        else:
+            # Never settled, so report on everything that was modelled
+            hours = (check + 1) * interval / 3600
+    count_carsparked = count_carsparked.sum(axis=0)
+    total_carsqueued = np.zeros(max(counts.size for counts in count_carsqueued), dtype=np.int64)
+    for counts in count_carsqueued:
+        total_carsqueued[:counts.size] += counts
+    count_carsqueued = total_carsqueued
+
+    cyclecount = hours
 
     end_time = time.time()
     elapsed_time = end_time - start_time
-    print("Model completed in ", int(round(elapsed_time,0)), " seconds", sep='')
-    print("Surveyed Hours:",hours)
-    print("Cars Queued = ", round(carsqueued * 100 / count_arrivals,2),"%", sep='')
-    if carsqueued > 0:
-        print("Average Queue time per Arrival/Queued Vehicle = ", round(queuetime / count_arrivals),"/",round(queuetime / carsqueued),"seconds")
-    # print("Random Arrivals = ", round(count_arrivals / cyclecount / precision,1))
-    # print("Service Time = ", servicetime)
-    print("Perfect Arrivals  Demand = ", round(count_arrivals / cyclecount / precision * servicetime / 3600,2),"spaces")
-    print("Random Arrivals Demand percentiles")
-    for value in percentiles:
-        print(value,"th - ",percentageoftime(value,count_carsparked)," parked and ", percentageoftime(value,count_carsqueued)," Queued", sep='')
-
-modelrun(arrivalrate,servicetime,spaces)
+
+    yield {"done": True, "result": {
+        "elapsed_time": elapsed_time,
+        "hours": hours,
+        "queued_pct": round(carsqueued * 100 / count_arrivals,2),
+        "queue_time_per_arrival": round(queuetime / count_arrivals),
+        "queue_time_per_queued": round(queuetime / carsqueued) if carsqueued > 0 else None,
+        "perfect_demand": round(count_arrivals / cyclecount / precision * servicetime / 3600,2),
+        "percentiles": {value: {"parked": parked, "queued": queued} for value, parked, queued in
+                        zip(percentiles, percentageoftime(percentiles,count_carsparked), percentageoftime(percentiles,count_carsqueued))},
+    }}
+
+def report(result):
+    lines = ["Model completed in " + str(int(round(result["elapsed_time"],0))) + " seconds"]
+    lines.append("Surveyed Hours: " + str(result["hours"]))
+    lines.append("Cars Queued = " + str(result["queued_pct"]) + "%")
+    if result["queue_time_per_queued"] is not None:
+        lines.append("Average Queue time per Arrival/Queued Vehicle =  " + str(result["queue_time_per_arrival"]) + " / " + str(result["queue_time_per_queued"]) + " seconds")
+    lines.append("Perfect Arrivals  Demand =  " + str(result["perfect_demand"]) + " spaces")
+    lines.append("Random Arrivals Demand percentiles")
+    for value, demand in result["percentiles"].items():
+        lines.append(str(value) + "th - " + str(demand["parked"]) + " parked and " + str(demand["queued"]) + " Queued")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    print(report(simulate(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]))))
+
@@ -0,0 +1,144 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+#Cython build of the kernels in sim_kernels.py, for hosts without Numba
+#Build in place with: cythonize -i carpark_sim.pyx
+#sim_kernels picks this module up ahead of Numba once it has been built,
+#so any change to a kernel there must be mirrored here
+import numpy as np
+
+
+def run_unlimited(arrivals, long long start, long long[:] departures, long long parked, long long[:] count_carsparked):
+    #Returns the updated number of parked cars and the arrivals in this batch
+    cdef const unsigned char[:] arrived = arrivals.view(np.uint8)
+    cdef Py_ssize_t size = departures.shape[0]
+    cdef long long servicetime = size - 1
+    cdef long long count_arrivals = 0
+    # Ring slot of this tick, stepped on rather than taken modulo the ring length every tick
+    cdef long long slot = (start + 1) % size
+    cdef long long due
+    cdef Py_ssize_t n
+    with nogil:
+        for n in range(arrived.shape[0]):
+            # Count current carpark utilisation
+            if parked >= count_carsparked.shape[0]:
+                with gil:
+                    raise IndexError("count_carsparked is too short for the parked cars")
+            count_carsparked[parked] += 1
+
+            # Release the cars whose stay ends this tick; most ticks have none
+            if departures[slot]:
+                parked -= departures[slot]
+                departures[slot] = 0
+
+            # Check if new car arrived and at to carpark
+            if arrived[n]:
+                count_arrivals += 1
+                parked += 1
+                due = slot + servicetime
+                if due >= size:
+                    due -= size
+                departures[due] += 1
+
+            slot += 1
+            if slot == size:
+                slot = 0
+    return parked, count_arrivals
+
+
+def run_blocking(double[:] arrival_times, double start, double end, double servicetime, long long spaces,
+                 double[:] finish, long long head, long long parked, double[:] count_carsparked):
+    #Event driven: jumps from one arrival or departure to the next between start and end
+    #finish is a ring of the departure times of the parked cars in arrival order, starting at head
+    #count_carsparked accumulates the seconds spent at each number of parked cars
+    #Returns the updated head and number of parked cars, and the blocked cars in this batch
+    cdef Py_ssize_t size = finish.shape[0]
+    cdef long long count_blocked = 0
+    cdef double now = start
+    cdef double arrival
+    cdef Py_ssize_t n
+    with nogil:
+        for n in range(arrival_times.shape[0]):
+            arrival = arrival_times[n]
+
+            # Every car has the same stay, so they leave in the order they arrived
+            while parked > 0 and finish[head] <= arrival:
+                count_carsparked[parked] += finish[head] - now
+                now = finish[head]
+                head = (head + 1) % size
+                parked -= 1
+
+            # Park the new car if there is space, otherwise turn it away
+            count_carsparked[parked] += arrival - now
+            now = arrival
+            if parked < spaces:
+                finish[(head + parked) % size] = arrival + servicetime
+                parked += 1
+            else:
+                count_blocked += 1
+
+        while parked > 0 and finish[head] <= end:
+            count_carsparked[parked] += finish[head] - now
+            now = finish[head]
+            head = (head + 1) % size
+            parked -= 1
+        count_carsparked[parked] += end - now
+    return head, parked, count_blocked
+
+
+def run_queueing(arrivals, long long start, long long[:] departures, long long parked, long long queue, long long spaces,
+                 long long[:] count_carsparked, long long[:] count_carsqueued):
+    #Returns the updated parked and queue lengths, the arrivals, the queued cars, the queue time and the ticks run
+    #Stops early, before a tick whose queue could outgrow count_carsqueued, so the caller can grow it and carry on
+    cdef const unsigned char[:] arrived = arrivals.view(np.uint8)
+    cdef Py_ssize_t size = departures.shape[0]
+    cdef long long servicetime = size - 1
+    cdef long long count_arrivals = 0
+    cdef long long carsqueued = 0
+    cdef long long queuetime = 0
+    cdef Py_ssize_t ticks = arrived.shape[0]
+    # Ring slot of this tick, stepped on rather than taken modulo the ring length every tick
+    cdef long long slot = (start + 1) % size
+    cdef long long due, finishing, moved
+    cdef Py_ssize_t n
+    with nogil:
+        for n in range(arrived.shape[0]):
+            if queue + 1 >= count_carsqueued.shape[0]:
+                ticks = n
+                break
+
+            # Check if new car arrived and at to carpark
+            if arrived[n]:
+                count_arrivals += 1
+                if parked < spaces:
+                    # Parked for this tick and the next servicetime - 1
+                    parked += 1
+                    due = slot + servicetime - 1
+                    if due >= size:
+                        due -= size
+                    departures[due] += 1
+                else:
+                    queue += 1
+                    carsqueued += 1
+
+            # Count current carpark utilisation
+            count_carsparked[parked] += 1
+            count_carsqueued[queue] += 1
+            queuetime += queue
+
+            # move finished cars out and queued cars in, the latter staying from the next tick
+            finishing = departures[slot]
+            if finishing:
+                departures[slot] = 0
+                parked -= finishing
+                moved = min(finishing, queue)
+                if moved > 0:
+                    parked += moved
+                    queue -= moved
+                    due = slot + servicetime
+                    if due >= size:
+                        due -= size
+                    departures[due] += moved
+
+            slot += 1
+            if slot == size:
+                slot = 0
+    return parked, queue, count_arrivals, carsqueued, queuetime, ticks
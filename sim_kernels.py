@@ -0,0 +1,178 @@
+#Compiled tick loops shared by the carpark web models
+#Each kernel runs one batch of ticks against state arrays owned by the caller,
+#so deciding when to stop and the reporting stay in the scripts themselves
+#The kernels release the GIL so independent replicates can run on threads
+#A built carpark_sim (Cython) is used ahead of these, and without Numba they run as plain Python
+#The plain helpers at the end set up the replicates and stability checks the scripts share
+import os
+
+import numpy as np
+
+# Length of each replicate's uncounted warm up, in stays
+BURN_IN_SERVICETIMES = 50
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+
+@njit(cache=True, nogil=True)
+def run_unlimited(arrivals, start, departures, parked, count_carsparked):
+    #Returns the updated number of parked cars and the arrivals in this batch
+    servicetime = departures.size - 1
+    count_arrivals = 0
+    # Ring slot of this tick, stepped on rather than taken modulo the ring length every tick
+    slot = (start + 1) % departures.size
+    for n in range(arrivals.size):
+        # Count current carpark utilisation
+        if parked >= count_carsparked.size:
+            raise IndexError("count_carsparked is too short for the parked cars")
+        count_carsparked[parked] += 1
+
+        # Release the cars whose stay ends this tick; most ticks have none
+        if departures[slot]:
+            parked -= departures[slot]
+            departures[slot] = 0
+
+        # Check if new car arrived and at to carpark
+        if arrivals[n]:
+            count_arrivals += 1
+            parked += 1
+            due = slot + servicetime
+            if due >= departures.size:
+                due -= departures.size
+            departures[due] += 1
+
+        slot += 1
+        if slot == departures.size:
+            slot = 0
+    return parked, count_arrivals
+
+
+@njit(cache=True, nogil=True)
+def run_blocking(arrival_times, start, end, servicetime, spaces, finish, head, parked, count_carsparked):
+    #Event driven: jumps from one arrival or departure to the next between start and end
+    #finish is a ring of the departure times of the parked cars in arrival order, starting at head
+    #count_carsparked accumulates the seconds spent at each number of parked cars
+    #Returns the updated head and number of parked cars, and the blocked cars in this batch
+    count_blocked = 0
+    now = start
+    for arrival in arrival_times:
+        # Every car has the same stay, so they leave in the order they arrived
+        while parked > 0 and finish[head] <= arrival:
+            count_carsparked[parked] += finish[head] - now
+            now = finish[head]
+            head = (head + 1) % finish.size
+            parked -= 1
+
+        # Park the new car if there is space, otherwise turn it away
+        count_carsparked[parked] += arrival - now
+        now = arrival
+        if parked < spaces:
+            finish[(head + parked) % finish.size] = arrival + servicetime
+            parked += 1
+        else:
+            count_blocked += 1
+
+    while parked > 0 and finish[head] <= end:
+        count_carsparked[parked] += finish[head] - now
+        now = finish[head]
+        head = (head + 1) % finish.size
+        parked -= 1
+    count_carsparked[parked] += end - now
+    return head, parked, count_blocked
+
+
+@njit(cache=True, nogil=True)
+def run_queueing(arrivals, start, departures, parked, queue, spaces, count_carsparked, count_carsqueued):
+    #Returns the updated parked and queue lengths, the arrivals, the queued cars, the queue time and the ticks run
+    #Stops early, before a tick whose queue could outgrow count_carsqueued, so the caller can grow it and carry on
+    servicetime = departures.size - 1
+    count_arrivals = 0
+    carsqueued = 0
+    queuetime = 0
+    ticks = arrivals.size
+    # Ring slot of this tick, stepped on rather than taken modulo the ring length every tick
+    slot = (start + 1) % departures.size
+    for n in range(arrivals.size):
+        if queue + 1 >= count_carsqueued.size:
+            ticks = n
+            break
+
+        # Check if new car arrived and at to carpark
+        if arrivals[n]:
+            count_arrivals += 1
+            if parked < spaces:
+                # Parked for this tick and the next servicetime - 1
+                parked += 1
+                due = slot + servicetime - 1
+                if due >= departures.size:
+                    due -= departures.size
+                departures[due] += 1
+            else:
+                queue += 1
+                carsqueued += 1
+
+        # Count current carpark utilisation
+        count_carsparked[parked] += 1
+        count_carsqueued[queue] += 1
+        queuetime += queue
+
+        # move finished cars out and queued cars in, the latter staying from the next tick
+        finishing = departures[slot]
+        if finishing:
+            departures[slot] = 0
+            parked -= finishing
+            moved = min(finishing, queue)
+            if moved > 0:
+                parked += moved
+                queue -= moved
+                due = slot + servicetime
+                if due >= departures.size:
+                    due -= departures.size
+                departures[due] += moved
+
+        slot += 1
+        if slot == departures.size:
+            slot = 0
+    return parked, queue, count_arrivals, carsqueued, queuetime, ticks
+
+
+def replicate_rngs(seed):
+    #Independent replicates, one per CPU, each with its own random stream and carpark state
+    #A fixed seed repeats a run exactly on the same host; without one every run is fresh
+    workers = os.cpu_count() or 1
+    base_seed = np.random.SeedSequence(seed).entropy
+    return [np.random.default_rng(base_seed * 1000003 + w) for w in range(workers)]
+
+
+def burn_in(servicetime):
+    #Seconds each replicate runs from an empty carpark before anything is counted, so splitting a run
+    #between more replicates doesn't count more of the start-up transient
+    return BURN_IN_SERVICETIMES * servicetime
+
+
+def split_interval(interval, workers):
+    #Shares a stability check interval between the replicates, the first few taking a tick more if it doesn't divide evenly
+    return [interval // workers + (w < interval % workers) for w in range(workers)]
+
+
+def settled(total, arrivals, last_total, last_arrivals):
+    #True once total / arrivals has moved by no more than 1 in 100000 since the last check
+    #Cross multiplied so the check stays in integers
+    return last_arrivals > 0 and abs(total * last_arrivals - last_total * arrivals) * 100000 <= arrivals * last_arrivals
+
+
+def final_result(progress):
+    #Runs a simulate_progress generator to the end and returns only its final result
+    for event in progress:
+        pass
+    return event["result"]
+
+
+try:
+    from carpark_sim import run_unlimited, run_blocking, run_queueing
+except ImportError:
+    pass